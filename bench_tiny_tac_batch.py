@@ -0,0 +1,92 @@
+"""
+Throughput comparison for tiny_tac_batch.py: one batched run() against
+run_single() called once per input, on a uniform program (every lane takes the
+same path) and on a divergent one (lanes branch differently and loop for
+different numbers of iterations).
+
+Usage: python bench_tiny_tac_batch.py [lanes ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from tiny_tac_batch import TinyBatchExecutor
+
+# Sum of the first 50 multiples of the input: same control flow in every lane.
+UNIFORM_TAC = """\
+x := in;
+s := 0;
+i := 0;
+l1:
+t1 := x * i;
+s := s + t1;
+i := i + 1;
+t2 := i = 50;
+if (t2) goto l2
+goto l1
+l2:
+out := s;
+halt;
+"""
+
+# Collatz steps: an if/else inside a repeat with per-lane trip counts.
+DIVERGENT_TAC = """\
+n := in;
+c := 0;
+l1:
+t1 := n / 2;
+t1 := t1 * 2;
+t1 := t1 = n;
+t1 := t1 = 0;
+if (t1) goto l2
+n := n / 2;
+goto l3;
+l2:
+t2 := 3 * n;
+n := t2 + 1;
+l3:
+c := c + 1;
+t3 := n < 2;
+if (t3) goto l4
+goto l1
+l4:
+out := c;
+halt;
+"""
+
+SINGLE_SAMPLE = 2000
+
+def bench(name, source, inputs):
+    with tempfile.NamedTemporaryFile("w", suffix = ".tac", delete = False) as f:
+        f.write(source)
+    try:
+        executor = TinyBatchExecutor(f.name)
+    finally:
+        os.remove(f.name)
+
+    start = time.perf_counter()
+    outputs, counts, status = executor.run(inputs)
+    batched = time.perf_counter() - start
+
+    # Time a sample of single runs and scale up to the full batch.
+    sample = inputs[:SINGLE_SAMPLE]
+    start = time.perf_counter()
+    for i, x in enumerate(sample):
+        assert executor.run_single([x]) == \
+            list(outputs[i, :counts[i]])
+    single = (time.perf_counter() - start) * len(inputs) / len(sample)
+
+    print("%-10s %9d lanes  batched %8.3fs  single %9.3fs  speed-up %6.1fx"
+          % (name, len(inputs), batched, single, single / batched))
+
+if __name__ == "__main__":
+
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000, 1000000]
+    rng = np.random.default_rng(0)
+    for lanes in sizes:
+        bench("uniform", UNIFORM_TAC, rng.integers(1, 1000, lanes))
+        bench("divergent", DIVERGENT_TAC, rng.integers(1, 1000, lanes))
@@ -0,0 +1,170 @@
+"""
+Tests for tiny_tac_batch.py. Each batched run is checked lane by lane
+against a one-input-at-a-time run of the same program.
+"""
+
+import pickle
+
+import numpy as np
+import pytest
+
+from tiny_Parser import TinyParser
+from tiny_tac_batch import (DIVIDE_BY_ZERO, HALTED, STEP_LIMIT,
+                            TinyBatchError, TinyBatchExecutor)
+from tiny_to_tac_compiler import TinyCompiler
+
+# Collatz steps with an if/else inside a repeat: lanes take different branches
+# on each iteration, leave the loop at different times and write different
+# numbers of values.
+COLLATZ_TAC = """\
+n := in;
+k := in;
+c := 0;
+l1:
+t1 := n / 2;
+t1 := t1 * 2;
+t1 := t1 = n;
+t1 := t1 = 0;
+if (t1) goto l2
+n := n / 2;
+goto l3;
+l2:
+t2 := 3 * n;
+n := t2 + 1;
+l3:
+c := c + 1;
+out := n;
+t3 := n < 2;
+if (t3) goto l4
+goto l1
+l4:
+t4 := c - k;
+out := t4;
+halt;
+"""
+
+# Lanes reading 0 halt; the rest spin forever.
+SPIN_TAC = """\
+x := in;
+if (x) goto l1
+halt;
+l1:
+goto l1
+"""
+
+DIVIDE_TAC = """\
+x := in;
+t1 := 10 / x;
+out := t1;
+halt;
+"""
+
+FACT_TNY = """\
+read x
+if 0 < x then
+  fact := 1
+  repeat
+    fact := fact * x
+    x := x - 1
+  until x = 0
+  write fact
+end
+"""
+
+def executor_for(tmp_path, source):
+    path = tmp_path / "prog.tac"
+    path.write_text(source)
+    return TinyBatchExecutor(str(path))
+
+def check_against_single(executor, inputs, max_steps = None):
+    outputs, counts, status = executor.run(inputs, max_steps)
+    assert outputs.shape == (len(inputs), counts.max())
+    for i, row in enumerate(inputs):
+        try:
+            expected = executor.run_single(np.atleast_1d(row), max_steps)
+        except TinyBatchError as err:
+            assert status[i] == err.status
+            continue
+        assert status[i] == HALTED
+        assert counts[i] == len(expected)
+        assert list(outputs[i, :counts[i]]) == expected
+    return status
+
+def steps_needed(executor, row):
+    """ Return the fewest max_steps for which run_single succeeds on 'row'.
+    """
+    lo, hi = 1, 1
+    while True:
+        try:
+            executor.run_single(row, hi)
+            break
+        except TinyBatchError:
+            lo, hi = hi + 1, 2 * hi
+    while lo < hi:
+        mid = (lo + hi) // 2
+        try:
+            executor.run_single(row, mid)
+            hi = mid
+        except TinyBatchError:
+            lo = mid + 1
+    return lo
+
+def test_divergent_program_matches_single_runs(tmp_path):
+    executor = executor_for(tmp_path, COLLATZ_TAC)
+    rng = np.random.default_rng(0)
+    inputs = np.column_stack([rng.integers(1, 300, 500), rng.integers(0, 9, 500)])
+    check_against_single(executor, inputs)
+
+def test_reads_past_end_of_row_yield_zero(tmp_path):
+    executor = executor_for(tmp_path, COLLATZ_TAC)
+    check_against_single(executor, np.array([1, 7, 27]))
+
+def test_compiled_fact_program(tmp_path):
+    source = tmp_path / "fact.tny"
+    source.write_text(FACT_TNY)
+    with open(tmp_path / "fact_pt.pkl", "wb") as outfile:
+        pickle.dump(TinyParser(str(source)).parse_program(), outfile)
+    compiler = TinyCompiler(str(tmp_path / "fact_pt.pkl"))
+    compiler.translate()
+    compiler.outfile.close()
+
+    executor = TinyBatchExecutor(compiler.outfilename)
+    outputs, counts, status = executor.run(np.arange(-2, 8))
+    assert not status.any()
+    assert list(counts) == [0, 0, 0, 1, 1, 1, 1, 1, 1, 1]
+    assert list(outputs[3:, 0]) == [1, 2, 6, 24, 120, 720, 5040]
+
+def test_max_steps_counts_each_lane_like_single_runs(tmp_path):
+    executor = executor_for(tmp_path, COLLATZ_TAC)
+    inputs = np.column_stack([np.arange(1, 200), np.zeros(199, dtype=int)])
+    needed = np.array([steps_needed(executor, row) for row in inputs])
+
+    status = check_against_single(executor, inputs, needed.max())
+    assert not status.any()
+    for limit in (needed.max() - 1, int(np.median(needed))):
+        status = check_against_single(executor, inputs, limit)
+        assert list(np.flatnonzero(status)) == list(np.flatnonzero(needed > limit))
+
+def test_max_steps_stops_only_looping_lanes(tmp_path):
+    executor = executor_for(tmp_path, SPIN_TAC)
+    outputs, counts, status = executor.run(np.array([1, 0, 3, 0]), max_steps = 1000)
+    assert list(status) == [STEP_LIMIT, HALTED, STEP_LIMIT, HALTED]
+    with pytest.raises(TinyBatchError) as err:
+        executor.run_single([1], max_steps = 1000)
+    assert err.value.status == STEP_LIMIT
+
+def test_division_by_zero_stops_only_its_lane(tmp_path):
+    executor = executor_for(tmp_path, DIVIDE_TAC)
+    outputs, counts, status = executor.run(np.array([2, 0, 5]))
+    assert list(status) == [HALTED, DIVIDE_BY_ZERO, HALTED]
+    assert list(counts) == [1, 0, 1]
+    assert list(outputs[:, 0]) == [5, 0, 2]
+    with pytest.raises(TinyBatchError) as err:
+        executor.run_single([0])
+    assert err.value.status == DIVIDE_BY_ZERO
+
+@pytest.mark.parametrize("inputs", [5, np.zeros((2, 2, 2))])
+def test_rejects_bad_input_shape(tmp_path, inputs):
+    executor = executor_for(tmp_path, DIVIDE_TAC)
+    with pytest.raises(ValueError):
+        executor.run(inputs)
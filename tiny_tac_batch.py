@@ -0,0 +1,352 @@
+"""
+Batched executor for three-address code produced by tiny_to_tac_compiler.py.
+Runs one compiled Tiny program over many input vectors at once: every variable
+is a NumPy array holding one value per input ("lane"), and each TAC instruction
+is executed as a single array operation across the batch.
+
+Divergent control flow is handled by keeping, for each instruction, the set of
+lanes waiting to execute it. At each step the lowest waiting instruction is
+executed for exactly those lanes, so lanes that leave a repeat loop early wait
+at the loop exit until the rest catch up, and halted lanes cost nothing.
+"""
+
+import operator
+import re
+import sys
+
+import numpy as np
+
+LABEL_RE = re.compile(r"^(\w+):$")
+HALT_RE = re.compile(r"^halt;?$")
+GOTO_RE = re.compile(r"^goto (\w+);?$")
+BRANCH_RE = re.compile(r"^if \((\w+)\) goto (\w+);?$")
+COPY_RE = re.compile(r"^(\w+) := (\w+);$")
+BINOP_RE = re.compile(r"^(\w+) := (\w+) (\S+) (\w+);$")
+
+#Define the array operation for each TAC operator.
+OPERATORS = {
+    "+" : np.add, "-" : np.subtract, "*" : np.multiply, "/" : np.floor_divide,
+    "=" : np.equal, "<" : np.less, ">" : np.greater,
+    "<=" : np.less_equal, ">=" : np.greater_equal}
+
+#Define the equivalent Python operation for one-input-at-a-time runs.
+SCALAR_OPERATORS = {
+    "+" : operator.add, "-" : operator.sub, "*" : operator.mul, "/" : operator.floordiv,
+    "=" : operator.eq, "<" : operator.lt, ">" : operator.gt,
+    "<=" : operator.le, ">=" : operator.ge}
+
+#Define the per-lane status codes reported by run.
+HALTED, DIVIDE_BY_ZERO, STEP_LIMIT = 0, 1, 2
+
+class TinyBatchError(Exception):
+    """
+    Runtime failure of a single-input run; 'status' holds the status code
+    run would report for that input.
+    """
+
+    def __init__(self, msg, status):
+        Exception.__init__(self, msg)
+        self.status = status
+
+class TinyBatchExecutor:
+
+    def __init__(self, filename):
+        """Create an executor for the TAC program stored at 'filename'.
+        """
+        with open(filename, "r") as infile:
+            self.__code = self.__assemble(infile.read())
+
+    def __assemble(self, source):
+        """ Translate TAC text in 'source' into a list of instruction
+        tuples with labels resolved to instruction indices.
+        """
+        code, labels = [], {}
+        for line in source.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            m = LABEL_RE.match(line)
+            if m:
+                labels[m.group(1)] = len(code)
+                continue
+
+            if HALT_RE.match(line):
+                code.append(("halt",))
+            elif GOTO_RE.match(line):
+                code.append(("goto", GOTO_RE.match(line).group(1)))
+            elif BRANCH_RE.match(line):
+                m = BRANCH_RE.match(line)
+                code.append(("if", self.__operand(m.group(1)), m.group(2)))
+            elif COPY_RE.match(line):
+                dest, src = COPY_RE.match(line).groups()
+                if src == "in":
+                    code.append(("read", dest))
+                elif dest == "out":
+                    code.append(("write", self.__operand(src)))
+                else:
+                    code.append(("copy", dest, self.__operand(src)))
+            elif BINOP_RE.match(line):
+                dest, left, op, right = BINOP_RE.match(line).groups()
+                if op not in OPERATORS:
+                    self.shriek("Unknown operator '%s'." % op)
+                code.append(("binop", dest, self.__operand(left),
+                             op, self.__operand(right)))
+            else:
+                self.shriek("Unrecognised instruction '%s'." % line)
+
+        for i, instr in enumerate(code):
+            if instr[0] in {"goto", "if"}:
+                if instr[-1] not in labels:
+                    self.shriek("Undefined label '%s'." % instr[-1])
+                code[i] = instr[:-1] + (labels[instr[-1]],)
+        return code
+
+    def __operand(self, token):
+        """ Return an integer constant for numeric 'token', else the
+        variable name itself.
+        """
+        return int(token) if token.isdigit() else token
+
+    def shriek(self, msg):
+        print("*** TinyBatchExecutor %s" % msg)
+        sys.exit(-1)
+
+    def run_single(self, inputs, max_steps = None):
+        """ Execute the program for one input vector 'inputs' (a sequence
+        of values for successive read statements) using Python integers.
+        Returns the list of values written. This is the one-input-at-a-time
+        reference for run(): arithmetic never overflows, and division by
+        zero or executing more than 'max_steps' instructions raises
+        TinyBatchError with the status run would report.
+        """
+        code, env, out = self.__code, {}, []
+        pc, readpos, steps = 0, 0, 0
+        value = lambda o: o if type(o) == int else env.get(o, 0)
+        while pc < len(code):
+            steps += 1
+            if max_steps is not None and steps > max_steps:
+                raise TinyBatchError("Exceeded %d steps." % max_steps, STEP_LIMIT)
+            instr = code[pc]
+            kind = instr[0]
+            pc += 1
+            if kind == "copy":
+                env[instr[1]] = value(instr[2])
+            elif kind == "binop":
+                op = SCALAR_OPERATORS[instr[3]]
+                try:
+                    env[instr[1]] = int(op(value(instr[2]), value(instr[4])))
+                except ZeroDivisionError:
+                    raise TinyBatchError("Division by zero.", DIVIDE_BY_ZERO)
+            elif kind == "read":
+                env[instr[1]] = int(inputs[readpos]) if readpos < len(inputs) else 0
+                readpos += 1
+            elif kind == "write":
+                out.append(value(instr[1]))
+            elif kind == "if":
+                if value(instr[1]) != 0:
+                    pc = instr[2]
+            elif kind == "goto":
+                pc = instr[1]
+            elif kind == "halt":
+                break
+        return out
+
+    def run(self, inputs, max_steps = None):
+        """ Execute the program once per row of 'inputs', a (batch,) or
+        (batch, reads) integer array whose row i supplies the values
+        consumed by successive read statements in lane i. Reads beyond the
+        end of a row yield 0.
+
+        Returns (outputs, counts, status): outputs is a (batch, max_writes)
+        array whose row i holds the values written by lane i, padded with
+        zeros, counts[i] is the number of writes lane i performed and
+        status[i] is HALTED, or the code of the error that stopped lane i.
+
+        A lane that divides by zero (DIVIDE_BY_ZERO) or would execute more
+        than 'max_steps' instructions of its own (STEP_LIMIT; None for no
+        limit) is stopped there, keeping the values it wrote so far, while
+        the other lanes run on. These are exactly the inputs for which
+        run_single raises TinyBatchError. Arithmetic is done in int64 and
+        silently wraps on overflow (e.g. factorials beyond 20!), unlike
+        run_single.
+        """
+        inputs = np.asarray(inputs, dtype=np.int64)
+        if inputs.ndim not in (1, 2):
+            raise ValueError("inputs must be a (batch,) or (batch, reads) "
+                             "array, got shape %s" % (inputs.shape,))
+        if inputs.ndim == 1:
+            inputs = inputs[:, np.newaxis]
+        batch, nreads = inputs.shape
+        if batch == 0:
+            return (np.zeros((0, 0), dtype=np.int64), np.zeros(0, dtype=np.intp),
+                    np.zeros(0, dtype=np.int8))
+
+        # A trailing zero column serves reads past the end of a row.
+        padded = np.zeros((batch, nreads + 1), dtype=np.int64)
+        padded[:, :nreads] = inputs
+        rows = np.arange(batch)
+
+        code = self.__code
+        halted = len(code)
+        env, owned = {}, set()
+        readpos = np.zeros(batch, dtype=np.intp)
+        counts = np.zeros(batch, dtype=np.intp)
+        status = np.zeros(batch, dtype=np.int8)
+        outputs = np.zeros((batch, 1), dtype=np.int64)
+        maxcount = 0
+
+        # Lanes waiting at each program counter, as a list of groups
+        # (lanes, base, add, top). With a step limit, lane lanes[j] has
+        # executed base[j] + add instructions and top bounds the largest
+        # such count, so a step costs the group O(1) bookkeeping.
+        limited = max_steps is not None
+        waiting = {0: [(rows, np.zeros(batch, dtype=np.int64) if limited else None, 0, 0)]}
+
+        def push(dest, lanes, base, add, top, sel = None):
+            if sel is not None:
+                lanes = lanes[sel]
+                base = base[sel] if limited else None
+            if dest < halted and len(lanes) > 0:
+                waiting.setdefault(dest, []).append((lanes, base, add, top))
+
+        def value(operand):
+            if type(operand) == int:
+                return operand
+            if operand not in env:
+                env[operand] = np.zeros(batch, dtype=np.int64)
+                owned.add(operand)
+            return env[operand]
+
+        def gather(operand, lanes):
+            val = value(operand)
+            return val if type(val) == int else val[lanes]
+
+        def target(dest):
+            # Return an array for 'dest' that no other variable shares, so
+            # masked stores can write into it in place.
+            if dest not in owned:
+                env[dest] = np.array(value(dest), dtype=np.int64)
+                owned.add(dest)
+            return env[dest]
+
+        def store(dest, result, lanes, full):
+            if not full:
+                target(dest)[lanes] = result
+            elif np.ndim(result) == 0:
+                env[dest] = np.full(batch, result, dtype=np.int64)
+                owned.add(dest)
+            else:
+                env[dest] = result.astype(np.int64, copy=False)
+                owned.add(dest)
+
+        with np.errstate(divide="ignore"):
+            while waiting:
+                # Run the lowest waiting instruction for every lane at it, so
+                # lanes that branch ahead wait there for the others.
+                cur = min(waiting)
+                parts = waiting.pop(cur)
+                if len(parts) == 1:
+                    lanes, base, add, top = parts[0]
+                else:
+                    # Sorted lane order keeps gathers and scatters cache friendly.
+                    lanes = np.concatenate([p[0] for p in parts])
+                    if limited:
+                        order = np.argsort(lanes)
+                        lanes = lanes[order]
+                        base = np.concatenate([p[1] + p[2] for p in parts])[order]
+                    else:
+                        lanes.sort()
+                    add, top = 0, max(p[3] for p in parts)
+
+                add, top = add + 1, top + 1
+                if limited and top > max_steps:
+                    used = base + add
+                    over = used > max_steps
+                    status[lanes[over]] = STEP_LIMIT
+                    lanes, base = lanes[~over], base[~over]
+                    if len(lanes) == 0:
+                        continue
+                    top = int(used[~over].max())
+
+                # When every lane is here, whole arrays stand in for gathers.
+                full = len(lanes) == batch
+
+                instr = code[cur]
+                kind = instr[0]
+
+                if kind == "copy":
+                    dest, src = instr[1], instr[2]
+                    if full and type(src) != int:
+                        if src != dest:
+                            # Share the source array; neither may be written in place.
+                            env[dest] = value(src)
+                            owned.discard(dest)
+                            owned.discard(src)
+                    else:
+                        store(dest, value(src) if full else gather(src, lanes),
+                              lanes, full)
+                elif kind == "binop":
+                    left = value(instr[2]) if full else gather(instr[2], lanes)
+                    right = value(instr[4]) if full else gather(instr[4], lanes)
+                    if instr[3] == "/":
+                        zero = np.equal(right, 0)
+                        if zero.any():
+                            # Stop the dividing-by-zero lanes; the rest carry on.
+                            zero = np.broadcast_to(zero, lanes.shape)
+                            status[lanes[zero]] = DIVIDE_BY_ZERO
+                            lanes = lanes[~zero]
+                            base = base[~zero] if limited else None
+                            if len(lanes) == 0:
+                                continue
+                            full = False
+                            left = gather(instr[2], lanes)
+                            right = gather(instr[4], lanes)
+                    store(instr[1], OPERATORS[instr[3]](left, right), lanes, full)
+                elif kind == "read":
+                    pos = readpos if full else readpos[lanes]
+                    store(instr[1], padded[lanes, np.minimum(pos, nreads)], lanes, full)
+                    if full:
+                        readpos += 1
+                    else:
+                        readpos[lanes] = pos + 1
+                elif kind == "write":
+                    col = counts if full else counts[lanes]
+                    need = (maxcount if full else int(col.max())) + 1
+                    if need > outputs.shape[1]:
+                        grown = np.zeros((batch, 2 * need), dtype=np.int64)
+                        grown[:, :outputs.shape[1]] = outputs
+                        outputs = grown
+                    outputs[lanes, col] = value(instr[1]) if full else gather(instr[1], lanes)
+                    counts[lanes] = col + 1
+                    maxcount = max(maxcount, need)
+                elif kind == "if":
+                    cond = value(instr[1]) if full else gather(instr[1], lanes)
+                    taken = np.not_equal(cond, 0)
+                    ntaken = np.count_nonzero(taken) if taken.ndim > 0 else \
+                        (len(lanes) if taken else 0)
+                    if ntaken == len(lanes):
+                        push(instr[2], lanes, base, add, top)
+                    elif ntaken == 0:
+                        push(cur + 1, lanes, base, add, top)
+                    else:
+                        push(instr[2], lanes, base, add, top, taken)
+                        push(cur + 1, lanes, base, add, top, ~taken)
+                    continue
+                elif kind == "goto":
+                    push(instr[1], lanes, base, add, top)
+                    continue
+                elif kind == "halt":
+                    continue
+
+                push(cur + 1, lanes, base, add, top)
+
+        return outputs[:, :maxcount], counts, status
+
+if __name__ == "__main__":
+
+    filename = "fact_pt_kh.tac"
+    executor = TinyBatchExecutor(filename)
+    inputs = np.arange(1, 11)
+    outputs, counts, status = executor.run(inputs)
+    for i in range(len(counts)):
+        print("%d: %s" % (inputs[i], outputs[i, :counts[i]].tolist()))
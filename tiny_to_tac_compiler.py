@@ -7,7 +7,7 @@ Myles Klapkowski, December 2021
 Code throughout and example by Kieran Herley, June 2020
 """
 
-from tiny_parser import *
+from tiny_Parser import *
 from pt_node import *
 import sys
 
@@ -51,6 +51,8 @@ class TinyCompiler:
         """
         skiptrue_label = self.__new_label()
         conditvar = self.__codegen_expression(root.children[0])
+        # Branch past the then-part when the condition is false.
+        self.outfile.write("%s := %s = 0;\n" % (conditvar, conditvar))
         self.outfile.write("if (%s) goto %s\n" % (conditvar, skiptrue_label))
         self.__codegen(root.children[1])
         